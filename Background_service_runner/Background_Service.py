@@ -1,48 +1,203 @@
 import time
+import heapq
+import itertools
 import threading
 import logging
 from datetime import datetime
 
+# Configure logging once for the whole module; asctime already timestamps each record
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+# Backpressure: widen a runner's interval after this many consecutive slow ticks
+OVERRUN_RATIO = 0.8
+OVERRUN_LIMIT = 3
+MAX_BACKOFF_INTERVAL = 60
+
+# Process-wide shutdown signal; set it through shutdown() so sleeping loops wake
+SHUTDOWN = threading.Event()
+# Events that wake each started runner and scheduler, for shutdown()
+_WAKE_EVENTS = set()
+_WAKE_LOCK = threading.Lock()
+
+def shutdown():
+    """Stop every runner and scheduler at once"""
+    SHUTDOWN.set()
+    with _WAKE_LOCK:
+        for event in _WAKE_EVENTS:
+            event.set()
+
+class _Backpressure:
+    """Tracks one task's effective interval, widening it while the task keeps overrunning"""
+    def __init__(self, interval_seconds, logger):
+        self.interval = interval_seconds
+        self.effective_interval = interval_seconds
+        self._overrun_count = 0
+        self.logger = logger
+
+    def update(self, name, elapsed, cpu_time):
+        """Widen the interval when the task keeps overrunning it, and relax it back otherwise"""
+        if elapsed > OVERRUN_RATIO * self.effective_interval:
+            self._overrun_count += 1
+            if self._overrun_count >= OVERRUN_LIMIT:
+                self._overrun_count = 0
+                self.effective_interval = min(self.effective_interval * 2,
+                                              max(self.interval, MAX_BACKOFF_INTERVAL))
+                self.logger.warning("Backpressure on %s (%.2fs wall, %.2fs cpu): widened interval to %ss",
+                                    name, elapsed, cpu_time, self.effective_interval)
+        else:
+            self._overrun_count = max(self._overrun_count - 1, 0)
+            narrower = max(self.effective_interval / 2, self.interval)
+            # Only step back down once the task would also fit the narrower interval
+            if (self._overrun_count == 0 and self.effective_interval > self.interval
+                    and elapsed <= OVERRUN_RATIO * narrower):
+                self.effective_interval = narrower
+        return self.effective_interval
+
 class BackgroundRunner:
     def __init__(self, interval_seconds, target_function, *args, **kwargs):
         self.interval = interval_seconds
         self.target_function = target_function
         self.args = args
         self.kwargs = kwargs
+        # Private so stop() only affects this runner; shutdown() also sets it
         self._stop_event = threading.Event()
         self.thread = None
         self.is_running = False
-        
-        # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        self._backpressure = _Backpressure(self.interval, self.logger)
 
     def _run(self):
-        self.logger.info(f"Background runner started at {datetime.now()}")
-        while not self._stop_event.is_set():
+        self.logger.info("Background runner loop started")
+        # The first tick runs immediately
+        next_deadline = time.monotonic()
+        while not (self._stop_event.is_set() or SHUTDOWN.is_set()):
+            started = time.monotonic()
+            cpu_started = time.thread_time()
             try:
-                self.logger.info(f"Executing {self.target_function.__name__} at {datetime.now()}")
+                self.logger.info("Executing %s", self.target_function.__name__)
                 self.target_function(*self.args, **self.kwargs)
             except Exception as e:
-                self.logger.error(f"Error in background task: {e}")
-            
-            # Wait for interval or stop signal
-            self._stop_event.wait(self.interval)
+                self.logger.error("Error in background task: %s", e)
+            interval = self._backpressure.update(self.target_function.__name__,
+                                                 time.monotonic() - started,
+                                                 time.thread_time() - cpu_started)
+
+            # Schedule the next tick; if the task overran, restart from now
+            # instead of firing back-to-back to catch up
+            next_deadline += interval
+            if next_deadline <= time.monotonic():
+                next_deadline = time.monotonic() + interval
+
+            # Wait until the next deadline or stop signal
+            remaining = next_deadline - time.monotonic()
+            if remaining > 0:
+                self._stop_event.wait(remaining)
 
     def start(self):
         if not self.is_running:
+            self._stop_event.clear()
+            with _WAKE_LOCK:
+                _WAKE_EVENTS.add(self._stop_event)
             self.thread = threading.Thread(target=self._run, daemon=True)
             self.thread.start()
             self.is_running = True
             self.logger.info("Background runner started")
 
-    def stop(self):
+    def stop(self, timeout=5.0):
         if self.is_running:
             self._stop_event.set()
-            self.thread.join()
+            with _WAKE_LOCK:
+                _WAKE_EVENTS.discard(self._stop_event)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                self.logger.warning("Background thread %s did not stop within %ss",
+                                    self.target_function.__name__, timeout)
             self.is_running = False
             self.logger.info("Background runner stopped")
 
+class Scheduler:
+    """Runs several periodic tasks from a single thread using a min-heap of deadlines"""
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._wake = threading.Event()
+        # Private so stop() only affects this scheduler; shutdown() sets _wake
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.thread = None
+        self.is_running = False
+        self.logger = logging.getLogger(__name__)
+
+    def add_task(self, interval_seconds, target_function, *args, **kwargs):
+        """Register a task to run every interval_seconds"""
+        entry = (time.monotonic() + interval_seconds, next(self._counter),
+                 _Backpressure(interval_seconds, self.logger), target_function, args, kwargs)
+        with self._lock:
+            heapq.heappush(self._heap, entry)
+        # Wake the loop so it can recompute the earliest deadline
+        self._wake.set()
+
+    def _run(self):
+        self.logger.info("Scheduler loop started")
+        while not (self._stop_event.is_set() or SHUTDOWN.is_set()):
+            with self._lock:
+                delay = self._heap[0][0] - time.monotonic() if self._heap else None
+            if delay is None or delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+
+            # Pop every task whose deadline has passed
+            now = time.monotonic()
+            due = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+
+            for deadline, _, backpressure, target_function, args, kwargs in due:
+                if self._stop_event.is_set() or SHUTDOWN.is_set():
+                    break
+                started = time.monotonic()
+                cpu_started = time.thread_time()
+                try:
+                    self.logger.info("Executing %s", target_function.__name__)
+                    target_function(*args, **kwargs)
+                except Exception as e:
+                    self.logger.error("Error in background task: %s", e)
+                interval = backpressure.update(target_function.__name__,
+                                               time.monotonic() - started,
+                                               time.thread_time() - cpu_started)
+
+                # Reschedule; snap forward if the task overran its slot
+                next_deadline = deadline + interval
+                if next_deadline <= time.monotonic():
+                    next_deadline = time.monotonic() + interval
+                with self._lock:
+                    heapq.heappush(self._heap, (next_deadline, next(self._counter),
+                                                backpressure, target_function, args, kwargs))
+
+    def start(self):
+        if not self.is_running:
+            self._stop_event.clear()
+            with _WAKE_LOCK:
+                _WAKE_EVENTS.add(self._wake)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            self.is_running = True
+            self.logger.info("Scheduler started")
+
+    def stop(self, timeout=5.0):
+        if self.is_running:
+            self._stop_event.set()
+            self._wake.set()
+            with _WAKE_LOCK:
+                _WAKE_EVENTS.discard(self._wake)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                self.logger.warning("Scheduler thread did not stop within %ss", timeout)
+            self.is_running = False
+            self.logger.info("Scheduler stopped")
+
 # Example log processing functions
 def fetch_logs(a):
     print(f"Fetching logs at {datetime.now()}",a)
@@ -58,26 +213,25 @@ def classify_logs():
 
 # Usage
 if __name__ == "__main__":
+    scheduler = Scheduler()
+
     # Run log fetching every 3 seconds
-    fetch_runner = BackgroundRunner(3, fetch_logs,2)
+    scheduler.add_task(3, fetch_logs, 2)
     
     # Run log processing every 6 seconds
-    process_runner = BackgroundRunner(6, process_logs)
+    scheduler.add_task(6, process_logs)
     
     # Run log classification every 12 seconds
-    classify_runner = BackgroundRunner(12, classify_logs)
+    scheduler.add_task(12, classify_logs)
     
-    # Start all runners
-    fetch_runner.start()
-    process_runner.start()
-    classify_runner.start()
+    # Start the scheduler thread
+    scheduler.start()
     
     try:
         # Keep main thread alive
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        print("Stopping all runners...")
-        fetch_runner.stop()
-        process_runner.stop()
-        classify_runner.stop()
+        print("Stopping scheduler...")
+        shutdown()
+        scheduler.stop()
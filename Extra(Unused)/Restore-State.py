@@ -7,18 +7,23 @@
 ===========================================
 """
 
-import json
 import os
 import subprocess
 import time
 import sys
-import psutil
-import shutil
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import win32gui, win32con, win32process
 
-# Directory to store profile copies
-PROFILE_COPIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_copies")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.state_file import load_state, state_exists
+from common.profile_utils import (
+    snapshot_procs,
+    snapshot_ports,
+    is_port_in_use,
+    is_profile_in_use,
+    create_profile_copy
+)
+from common.browser_defaults import URL_PREFIXES, TITLE_PREFIXES, RESTORE_ARGS, DETACH_KWARGS
 
 # Default parameters
 EXE_PATHS = {
@@ -29,124 +34,23 @@ EXE_PATHS = {
 
 STATE_FILE = "D:\\Major\\IntelliOS\\State\\state.json"
 
-def is_port_in_use(port):
-    """Check if a port is already in use."""
-    if not port:
-        return False
-    try:
-        port = int(port)
-        for proc in psutil.process_iter(['connections']):
-            try:
-                for conn in proc.connections():
-                    if conn.laddr.port == port:
-                        return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-    except (ValueError, TypeError):
-        return False
-    return False
-
-def is_profile_in_use(profile_path):
-    """Check if a browser profile is currently in use."""
-    if not profile_path:
-        return False
-        
-    # Create the profile directory if it doesn't exist
-    os.makedirs(profile_path, exist_ok=True)
-    
-    try:
-        lock_file = os.path.join(profile_path, "Lock")
-        if os.path.exists(lock_file):
-            try:
-                # Try to delete the lock file - if we can, profile isn't truly locked
-                os.remove(lock_file)
-                return False
-            except (PermissionError, OSError):
-                # If we can't delete it, profile is in use
-                return True
-        
-        # Check for running browser processes using this profile
-        for proc in psutil.process_iter(['cmdline']):
-            try:
-                cmdline = proc.cmdline()
-                if any(profile_path.lower() in arg.lower() for arg in cmdline if isinstance(arg, str)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-                continue
-    except Exception as e:
-        print(f"Error checking profile usage: {str(e)}")
-        return False
-    
-    return False
-
-def create_profile_copy(original_profile):
-    """Create a copy of the browser profile with a new name."""
-    if not original_profile:
-        return None
-    
-    try:
-        # Create timestamp-based profile name
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        profile_name = f"profile_copy_{timestamp}"
-        new_profile_path = os.path.join(PROFILE_COPIES_DIR, profile_name)
-        
-        # Create the copies directory if it doesn't exist
-        os.makedirs(PROFILE_COPIES_DIR, exist_ok=True)
-        
-        # Create the basic profile structure
-        print(f"Creating new profile at {new_profile_path}")
-        os.makedirs(new_profile_path, exist_ok=True)
-        os.makedirs(os.path.join(new_profile_path, "Default"), exist_ok=True)
-        
-        # If original profile exists, try to copy essential files
-        if os.path.exists(original_profile):
-            # List of essential directories to copy
-            essential_dirs = [
-                "Default/Bookmarks",
-                "Default/Preferences",
-                "Default/Favicons",
-                "Default/History",
-                "Default/Login Data",
-                "Default/Web Data"
-            ]
-            
-            for item in essential_dirs:
-                src = os.path.join(original_profile, item)
-                dst = os.path.join(new_profile_path, item)
-                dst_dir = os.path.dirname(dst)
-                
-                if os.path.exists(src):
-                    try:
-                        # Ensure the destination directory exists
-                        os.makedirs(dst_dir, exist_ok=True)
-                        # Try to copy the file
-                        if os.path.isfile(src):
-                            shutil.copy2(src, dst)
-                    except (PermissionError, OSError) as e:
-                        print(f"Warning: Could not copy {item}: {str(e)}")
-                        continue
-        
-        return new_profile_path
-    except Exception as e:
-        print(f"Warning: Error while creating profile copy: {str(e)}")
-        # Even if we hit some errors, return the new profile path if it was created
-        if os.path.exists(new_profile_path):
-            return new_profile_path
-        return None
-
 def restore_browser(browser, windows, exe):
     """Restore browser windows and their tabs"""
     print(exe)
     if not windows or len(windows) == 0:
         return
 
+    # Snapshot browser processes and sockets once for all windows of this browser
+    proc_snapshot = snapshot_procs()
+    used_ports = snapshot_ports()
+
     # Open each window as a separate browser window and pass URLs
     for window in windows:
         urls = []
         for tab in window['tabs']:
             if (tab.get('url') and 
-                any(tab['url'].startswith(prefix) for prefix in ['https://', 'http://', 'file://', 'chrome://', 'edge://']) and
-                not any(tab.get('title', '').startswith(prefix) for prefix in ['https://', 'http://'])):
+                tab['url'].startswith(URL_PREFIXES) and
+                not (tab.get('title') or '').startswith(TITLE_PREFIXES)):
                 urls.append(tab['url'])
         
         if len(urls) == 0:
@@ -155,7 +59,7 @@ def restore_browser(browser, windows, exe):
         
         # Check if debugging port is in use
         debugging_port = window.get('debuggingPort')
-        if is_port_in_use(debugging_port):
+        if is_port_in_use(debugging_port, used_ports):
             print(f"Error: Debugging port {debugging_port} is already in use", file=sys.stderr)
             continue
             
@@ -165,7 +69,7 @@ def restore_browser(browser, windows, exe):
         
         print(f"Checking profile: {original_profile}")
         if original_profile:
-            if is_profile_in_use(original_profile):
+            if is_profile_in_use(original_profile, proc_snapshot):
                 print(f"Profile {original_profile} is in use, creating a copy...")
                 new_profile = create_profile_copy(original_profile)
                 if new_profile:
@@ -179,16 +83,17 @@ def restore_browser(browser, windows, exe):
         
         # Start a new window with multiple tabs
         try:
-            args = [
+            args = (
                 exe,
                 f"--remote-debugging-port={debugging_port}",
                 f"--user-data-dir={profile_path}",
-                "--args",
-                "--new-window",
-                "--no-first-run",
-                "--no-default-browser-check",
-            ]
-            subprocess.Popen(args + urls)
+                *RESTORE_ARGS,
+                *urls
+            )
+            subprocess.Popen(args, **DETACH_KWARGS)
+            # The snapshot predates this launch, so claim its port for later windows
+            if str(debugging_port).isdigit():
+                used_ports.add(int(debugging_port))
             time.sleep(0.3)
         except Exception as e:
             print(f"Error launching {browser}: {str(e)}", file=sys.stderr)
@@ -220,6 +125,13 @@ def restore_browser(browser, windows, exe):
 #     else:
 #         win32gui.ShowWindow(hwnd, win32con.SW_NORMAL)
 
+# Apps that open every file passed on one command line in a single process;
+# others get one instance per file. Names are lowercased for comparison
+BATCH_FRIENDLY_APPS = frozenset(name.lower() for name in [
+    "WINWORD.EXE", "EXCEL.EXE", "POWERPNT.EXE", "Acrobat.exe", "AcroRd32.exe",
+    "notepad++.exe", "Code.exe", "sublime_text.exe"
+])
+
 def restore_app_files(exe, items, name, window_info=None):
     """Restore applications and their associated files"""
     if not exe or not os.path.exists(exe):
@@ -235,16 +147,14 @@ def restore_app_files(exe, items, name, window_info=None):
             print(f"Error launching {name}: {str(e)}", file=sys.stderr)
             return
 
-    # Some apps prefer one process with multiple args (Word/Excel), others prefer separate instances
-    one_shot_apps = ["WINWORD.EXE", "EXCEL.EXE", "POWERPNT.EXE", "Acrobat.exe", "AcroRd32.exe"]
     process = None
     try:
-        if name in one_shot_apps:
+        if (name or '').lower() in BATCH_FRIENDLY_APPS:
             process = subprocess.Popen([exe] + items)
         else:
-            for item in items:
-                subprocess.Popen([exe, item])
-                time.sleep(0.1)
+            # Launch the separate instances concurrently instead of pacing them with sleeps
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(lambda item: subprocess.Popen([exe, item]), items))
 
         # Wait briefly for the window to appear
         time.sleep(1)
@@ -265,14 +175,13 @@ def restore_app_files(exe, items, name, window_info=None):
 
 def main():
     # Check if state file exists
-    if not os.path.exists(STATE_FILE):
+    if not state_exists(STATE_FILE):
         print(f"Error: State file not found: {STATE_FILE}", file=sys.stderr)
         sys.exit(1)
 
     # Read state file
     try:
-        with open(STATE_FILE, 'r', encoding='utf-8') as f:
-            state = json.load(f)
+        state = load_state(STATE_FILE)
     except Exception as e:
         print(f"Error reading state file: {str(e)}", file=sys.stderr)
         sys.exit(1)
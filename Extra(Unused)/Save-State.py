@@ -1,32 +1,47 @@
 import os
+import re
 import sys
-import json
 import datetime
+from collections import defaultdict
+from urllib.parse import unquote
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import psutil
 import win32com.client
 import win32process
 import win32gui
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common import json_utils
+from common.state_file import save_state
+from common.browser_defaults import DEVTOOLS_TIMEOUT, URL_PREFIXES, TITLE_PREFIXES
+
 OUT_FILE = r"D:\\Major\\Restoration_engine\\state.json"
 BROWSER_PORTS_FILE = r"D:\\Major\\IntelliOS\\Restoration_engine\\browser_ports.json"
 USE_HANDLE = True  # Not implemented, placeholder
 
+# Keep-alive session shared by all DevTools requests
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
 def get_devtools_tabs(base_url):
     try:
-        resp = requests.get(f"{base_url}/json", timeout=10)
-        tabs = resp.json()
-        formatted_tabs = []
-        for tab in tabs:
-            if (tab.get('url') and 
-                any(tab['url'].startswith(prefix) for prefix in ['https://', 'http://', 'file://', 'chrome://', 'edge://']) and
-                not any(tab.get('title', '').startswith(prefix) for prefix in ['https://', 'http://']) and tab.get('type') == 'page'):
-                formatted_tabs.append({
-                    "url": tab.get("url"),
-                    "title": tab.get("title"),
-                    "description": tab.get("description", "")
-                })
-        return formatted_tabs
+        resp = SESSION.get(f"{base_url}/json", timeout=DEVTOOLS_TIMEOUT)
+        # Reject service workers, iframes etc. before building any entries
+        tabs = [
+            tab for tab in json_utils.loads(resp.content)
+            if tab.get('type') == 'page' and tab.get('url', '').startswith(URL_PREFIXES)
+        ]
+        return [
+            {
+                "url": tab["url"],
+                "title": tab.get("title"),
+                "description": tab.get("description", "")
+            }
+            for tab in tabs
+            if not tab.get('title', '').startswith(TITLE_PREFIXES)
+        ]
     except Exception:
         return []
 
@@ -97,19 +112,21 @@ def get_onenote_files():
     except Exception:
         return []
 
+# Quoted arguments, and bare arguments that look like drive or UNC paths
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+_WINPATH_RE = re.compile(r'^[A-Za-z]:\\|^\\\\')
+
 def get_file_args_from_commandline(cmd):
     if not cmd:
         return []
-    import re
     candidates = []
-    quoted = re.findall(r'"([^"]+)"', cmd)
+    quoted = _QUOTED_RE.findall(cmd)
     candidates.extend(quoted)
     parts = cmd.split()
     for p in parts:
-        if re.match(r'^[A-Za-z]:\\', p) or re.match(r'^\\\\', p):
+        if _WINPATH_RE.match(p):
             candidates.append(p.strip('"'))
         if p.startswith("file:///"):
-            from urllib.parse import unquote
             decoded = unquote(p).replace("file:/", "")
             candidates.append(decoded)
     files = []
@@ -117,145 +134,146 @@ def get_file_args_from_commandline(cmd):
         norm = c.strip().strip('"')
         if os.path.isfile(norm):
             files.append(norm)
-    return list(set(files))
+    return list(dict.fromkeys(files))
+
+_SHOW_STATES = {2: "minimized", 3: "maximized"}
+_GWL_EXSTYLE = -20
+_WS_EX_TOOLWINDOW = 0x00000080
 
-def get_main_window_info(pid):
-    def callback(hwnd, window_info):
+def index_windows_by_pid(pids_of_interest=None):
+    """
+    Enumerate top-level windows once and group the visible non-tool ones by owning PID.
+    When pids_of_interest is given, windows of other processes are skipped
+    before their style or details are read.
+    """
+    hwnd_by_pid = defaultdict(list)
+
+    def callback(hwnd, _):
         try:
+            # Cheapest rejections first; title and rect are only read later for matches
+            if not win32gui.IsWindowVisible(hwnd):
+                return True
             _, found_pid = win32process.GetWindowThreadProcessId(hwnd)
-            if found_pid == pid and win32gui.IsWindowVisible(hwnd):
-                # Get window title
-                title = win32gui.GetWindowText(hwnd)
-                
-                # Get window rect (position and size)
-                rect = win32gui.GetWindowRect(hwnd)
-                left, top, right, bottom = rect
-                
-                # Get window state
-                style = win32gui.GetWindowLong(hwnd, -16)  # GWL_STYLE
-                state = "minimized" if style & 0x20000000 else "maximized" if style & 0x01000000 else "normal"
-                
-                window_info.append({
-                    "title": title,
-                    "position": {
-                        "x": left,
-                        "y": top
-                    },
-                    "size": {
-                        "width": right - left,
-                        "height": bottom - top
-                    },
-                    "state": state
-                })
+            if pids_of_interest is not None and found_pid not in pids_of_interest:
+                return True
+            if win32gui.GetWindowLong(hwnd, _GWL_EXSTYLE) & _WS_EX_TOOLWINDOW:
+                return True
+            hwnd_by_pid[found_pid].append(hwnd)
         except Exception:
             pass
         return True
+
+    win32gui.EnumWindows(callback, None)
+    return hwnd_by_pid
+
+def _hwnd_to_info(hwnd):
+    # Get window title
+    title = win32gui.GetWindowText(hwnd)
     
-    window_info = []
-    win32gui.EnumWindows(lambda hwnd, _: callback(hwnd, window_info), None)
-    return window_info[0] if window_info else None
+    # Get window rect (position and size)
+    rect = win32gui.GetWindowRect(hwnd)
+    left, top, right, bottom = rect
+    
+    # Get window state from showCmd (2 = SW_SHOWMINIMIZED, 3 = SW_SHOWMAXIMIZED)
+    state = _SHOW_STATES.get(win32gui.GetWindowPlacement(hwnd)[1], "normal")
+    
+    return {
+        "title": title,
+        "position": {
+            "x": left,
+            "y": top
+        },
+        "size": {
+            "width": right - left,
+            "height": bottom - top
+        },
+        "state": state
+    }
 
-whitelist = [
+def get_main_window_info(pid, hwnd_by_pid):
+    for hwnd in hwnd_by_pid.get(pid, ()):
+        try:
+            return _hwnd_to_info(hwnd)
+        except Exception:
+            continue
+    return None
+
+# Captured applications and Office getters, keyed by lowercased process name
+WHITELIST = frozenset(name.lower() for name in [
     "WINWORD.EXE","EXCEL.EXE","POWERPNT.EXE","VISIO.EXE", "MSPUB.EXE","MSACCESS.EXE","WINPROJ.EXE","ONENOTE.EXE",
     "notepad.exe","notepad++.exe",
-    "code.exe","Code.exe","devenv.exe","sublime_text.exe","Acrobat.exe","AcroRd32.exe",
+    "code.exe","devenv.exe","sublime_text.exe","Acrobat.exe","AcroRd32.exe",
     "vlc.exe","obs64.exe","photoshop.exe","idea64.exe","pycharm64.exe"
-]
-
-office_apps = {
-    "WINWORD.EXE": get_word_docs,
-    "EXCEL.EXE": get_excel_books,
-    "POWERPNT.EXE": get_powerpoint_pres,
-    "VISIO.EXE": get_visio_drawings,
-    "MSPUB.EXE": get_publisher_docs,
-    "MSACCESS.EXE": get_access_dbs,
-    "WINPROJ.EXE": get_project_files,
-    "ONENOTE.EXE": get_onenote_files
+])
+
+OFFICE_APPS = {
+    "winword.exe": get_word_docs,
+    "excel.exe": get_excel_books,
+    "powerpnt.exe": get_powerpoint_pres,
+    "visio.exe": get_visio_drawings,
+    "mspub.exe": get_publisher_docs,
+    "msaccess.exe": get_access_dbs,
+    "winproj.exe": get_project_files,
+    "onenote.exe": get_onenote_files
 }
 
-apps = []
-for proc in psutil.process_iter(['pid', 'name', 'exe', 'cmdline']):
-    name = proc.info['name']
-    if name not in whitelist:
+# Enumerate processes once and reuse the snapshot for every lookup below;
+# exe and cmdline are only resolved for whitelisted processes
+procs = []
+for p in psutil.process_iter(['name', 'pid']):
+    key = (p.info['name'] or '').lower()
+    if key not in WHITELIST:
         continue
-    
+    try:
+        # as_dict leaves unreadable fields as None instead of dropping the process
+        info = p.as_dict(['pid', 'name', 'exe', 'cmdline'])
+    except psutil.NoSuchProcess:
+        continue
+    procs.append((key, info['name'], info['exe'], info['pid'], info['cmdline']))
+
+# Enumerate windows once for the apps that get a windowInfo below
+hwnd_by_pid = index_windows_by_pid({pid for key, _, _, pid, _ in procs if key in OFFICE_APPS})
+
+apps = []
+for key, name, exe, pid, cmdline in procs:
     # files = []
-    # cmdline = ' '.join(proc.info['cmdline']) if proc.info['cmdline'] else ''
+    # cmdline = ' '.join(cmdline) if cmdline else ''
     # files += get_file_args_from_commandline(cmdline)
     # # USE_HANDLE not implemented
-    # files = list(set(files))
-    # main_window = get_main_window_title(proc.info['pid'])
+    # files = list(dict.fromkeys(files))
+    # main_window = get_main_window_title(pid)
     # apps.append({
     #     "name": name,
-    #     "pid": proc.info['pid'],
-    #     "exe": proc.info['exe'],
+    #     "pid": pid,
+    #     "exe": exe,
     #     "cmdline": cmdline,
     #     "files": files,
     #     "windowInfo": main_window
     # })
 
-    if name in office_apps.keys():
-        files = office_apps[name]()
+    if key in OFFICE_APPS:
+        files = OFFICE_APPS[key]()
         if files:
             apps.append({
                 "name": name,
-                "pid": proc.info['pid'],
-                "exe": proc.info['exe'],
-                "cmdline": ' '.join(proc.info['cmdline']) if proc.info['cmdline'] else '',
-                "files": list(set(files)),
-                "windowInfo": get_main_window_info(proc.info['pid'])
+                "pid": pid,
+                "exe": exe,
+                "cmdline": ' '.join(cmdline) if cmdline else '',
+                "files": list(dict.fromkeys(files)),
+                "windowInfo": get_main_window_info(pid, hwnd_by_pid)
             })
 
-# Office COM
-# word_docs = get_word_docs()
-# if word_docs:
-#     word_exe = next((proc.info['exe'] for proc in psutil.process_iter(['name', 'exe']) if proc.info['name'] == "WINWORD.EXE"), None)
-#     apps.append({
-#         "name": "WINWORD.EXE",
-#         "pid": None,
-#         "exe": word_exe,
-#         "cmdline": None,
-#         "files": list(set(word_docs)),
-#         "windowInfo": None
-#     })
-# xl_books = get_excel_books()
-# if xl_books:
-#     xl_exe = next((proc.info['exe'] for proc in psutil.process_iter(['name', 'exe']) if proc.info['name'] == "EXCEL.EXE"), None)
-#     apps.append({
-#         "name": "EXCEL.EXE",
-#         "pid": None,
-#         "exe": xl_exe,
-#         "cmdline": None,
-#         "files": list(set(xl_books)),
-#         "windowInfo": None
-#     })
-# pp_pres = get_powerpoint_pres()
-# if pp_pres:
-#     pp_exe = next((proc.info['exe'] for proc in psutil.process_iter(['name', 'exe']) if proc.info['name'] == "POWERPNT.EXE"), None)
-#     apps.append({
-#         "name": "POWERPNT.EXE",
-#         "pid": None,
-#         "exe": pp_exe,
-#         "cmdline": None,
-#         "files": list(set(pp_pres)),
-#         "windowInfo": None
-#     })
 
 def get_browser_states():
     try:
-        with open(BROWSER_PORTS_FILE, 'r') as f:
-            browser_data = json.load(f)
+        browser_data = json_utils.load_file(BROWSER_PORTS_FILE)
     except Exception as e:
         print(f"Error reading browser ports file: {e}")
         return []
 
-    browsers = []
-    
-    # Process all browser types
+    # Collect every active debugging port first so they can be queried together
+    targets = []
     for browser_name, browser_info in browser_data.items():
-        browser_windows = []
-        browser_exe = browser_info.get("exe")
-        
         # Process all profiles for this browser
         for profile_info in browser_info.get("profiles", []):
             # Handle both profile name formats
@@ -266,23 +284,32 @@ def get_browser_states():
             # Process all instances of this profile
             for instance in profile_info.get("instances", []):
                 if instance.get("status") == "active":
-                    port = instance["port"]
-                    tabs = get_devtools_tabs(f"http://localhost:{port}")
-                    
-                    if tabs:
-                        window = {
-                            "profile": profile_path,
-                            "debuggingPort": int(port),
-                            "tabs": tabs
-                        }
-                        browser_windows.append(window)
-        
-        # Add browser to list if it has active windows
-        if browser_windows:
+                    targets.append((browser_name, profile_path, instance["port"]))
+
+    results = []
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(32, len(targets))) as executor:
+            results = list(executor.map(
+                lambda target: get_devtools_tabs(f"http://localhost:{target[2]}"), targets))
+
+    # Group windows back under their browser, keeping the file order
+    windows_by_browser = {}
+    for (browser_name, profile_path, port), tabs in zip(targets, results):
+        if tabs:
+            windows_by_browser.setdefault(browser_name, []).append({
+                "profile": profile_path,
+                "debuggingPort": int(port),
+                "tabs": tabs
+            })
+
+    # Add browser to list if it has active windows
+    browsers = []
+    for browser_name, browser_info in browser_data.items():
+        if browser_name in windows_by_browser:
             browsers.append({
                 "browser": browser_name,  
-                "exe": browser_exe,
-                "windows": browser_windows
+                "exe": browser_info.get("exe"),
+                "windows": windows_by_browser[browser_name]
             })
     
     return browsers
@@ -297,6 +324,6 @@ state = {
 }
 
 os.makedirs(os.path.dirname(OUT_FILE), exist_ok=True)
-with open(OUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(state, f, indent=2, ensure_ascii=False)
-print(f"State saved to {OUT_FILE}")
\ No newline at end of file
+# JSON by default, since Restore-State.ps1 reads state.json with ConvertFrom-Json
+saved_path = save_state(state, OUT_FILE, "msgpack" if "--msgpack" in sys.argv else "json")
+print(f"State saved to {saved_path}")
\ No newline at end of file
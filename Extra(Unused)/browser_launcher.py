@@ -2,11 +2,23 @@ import subprocess
 import json
 import os
 import sys
+import shutil
+import socket
 from pathlib import Path
-import psutil
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common import json_utils
+from common.state_file import write_bytes_atomic
+from common.profile_utils import get_listening_ports
+from common.browser_defaults import LAUNCH_ARGS, DETACH_KWARGS
 
 # Constants
 BASE_DEBUG_PORT = 9222
+MAX_DEBUG_PORT = 9300
+PORT_RANGE_MASK = (1 << (MAX_DEBUG_PORT - BASE_DEBUG_PORT + 1)) - 1
+# Searched only once the preferred range is exhausted
+_HIGHEST_PORT = 65535
+_FALLBACK_RANGE_MASK = ((1 << (_HIGHEST_PORT - BASE_DEBUG_PORT + 1)) - 1) & ~PORT_RANGE_MASK
 PORTS_FILE = "browser_ports.json"
 SUPPORTED_BROWSERS = {
     'chrome': {
@@ -21,49 +33,119 @@ SUPPORTED_BROWSERS = {
     }
 }
 
-def load_port_data():
+# Resolve the platform and browser executables once at import
+if sys.platform.startswith('win'):
+    _PLATFORM = 'windows'
+elif sys.platform.startswith('darwin'):
+    _PLATFORM = 'darwin'
+else:
+    _PLATFORM = 'linux'
+
+BROWSER_EXE = {
+    name: shutil.which(paths[_PLATFORM]) or paths[_PLATFORM]
+    for name, paths in SUPPORTED_BROWSERS.items()
+}
+
+def load_port_data(path=PORTS_FILE):
     """Load existing port assignments from the JSON file."""
     try:
-        if os.path.exists(PORTS_FILE):
-            with open(PORTS_FILE, 'r') as f:
-                return json.load(f)
+        if os.path.exists(path):
+            return json_utils.load_file(path)
         return {"browsers": {}}
     except json.JSONDecodeError:
-        print(f"Error: Corrupted {PORTS_FILE} file. Creating new one.")
+        # orjson's decode error subclasses this one too
+        print(f"Error: Corrupted {path} file. Creating new one.")
         return {"browsers": {}}
 
-def save_port_data(data):
-    """Save port assignments to the JSON file."""
-    try:
-        with open(PORTS_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        print(f"Error saving port data: {e}")
-
-def find_next_available_port(port_data):
-    """Find the next available debugging port."""
-    used_ports = set()
-    for browser_info in port_data["browsers"].values():
-        used_ports.update(int(port) for port in browser_info["ports"])
-    
-    port = BASE_DEBUG_PORT
-    while port in used_ports:
-        port += 1
-    return port
-
-def is_port_in_use(port):
-    """Check if a port is already in use."""
-    for proc in psutil.process_iter(['connections']):
+def _ports_to_mask(ports):
+    """Pack the ports from BASE_DEBUG_PORT upwards into a bitmask."""
+    mask = 0
+    for port in ports:
+        offset = port - BASE_DEBUG_PORT
+        if 0 <= offset <= _HIGHEST_PORT - BASE_DEBUG_PORT:
+            mask |= 1 << offset
+    return mask
+
+class PortsDB:
+    """In-memory cache of port assignments that is written back once on flush()."""
+    def __init__(self, path=PORTS_FILE):
+        self.path = path
+        self._data = None
+        self._dirty = False
+        # Bit i set means BASE_DEBUG_PORT + i was claimed by this process; its
+        # browser may not be listening yet, so the probes can't be relied on
+        self._used_mask = 0
+
+    def load(self):
+        """Return the cached port data, reading the file on first use."""
+        if self._data is None:
+            self._data = load_port_data(self.path)
+            self._data.setdefault("browsers", {})
+        return self._data
+
+    def alloc_port(self, busy_ports=()):
+        """Claim the lowest free debugging port, preferring BASE_DEBUG_PORT..MAX_DEBUG_PORT.
+
+        Ports recorded in the file only count as taken while something still
+        listens on them, so the candidate is confirmed with a bind probe
+        rather than checked against old entries; busy_ports may be stale.
+        """
+        self.load()
+        busy_mask = self._used_mask | _ports_to_mask(busy_ports)
+        for range_mask in (PORT_RANGE_MASK, _FALLBACK_RANGE_MASK):
+            while True:
+                free = ~busy_mask & range_mask
+                if not free:
+                    break
+                bit = (free & -free).bit_length() - 1
+                if _port_bindable(BASE_DEBUG_PORT + bit):
+                    self._used_mask |= 1 << bit
+                    return BASE_DEBUG_PORT + bit
+                busy_mask |= 1 << bit
+        raise RuntimeError(f"No free debugging port from {BASE_DEBUG_PORT} upwards")
+
+    def release_port(self, port):
+        """Return a port claimed by alloc_port to the free pool."""
+        self._used_mask &= ~_ports_to_mask((port,))
+
+    def record_launch(self, browser_name, profile_name, port):
+        """Record a launched debugging port in memory."""
+        browsers = self.load()["browsers"]
+        browser_key = f"{browser_name}_{profile_name}"
+        browsers.setdefault(browser_key, {"ports": []})["ports"].append(str(port))
+        self._dirty = True
+
+    def flush(self):
+        """Write pending changes to the JSON file atomically."""
+        if not self._dirty:
+            return
         try:
-            for conn in proc.connections():
-                if conn.laddr.port == port:
-                    return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-    return False
+            write_bytes_atomic(self.path, json_utils.dumps(self._data, indent=True))
+            self._dirty = False
+        except Exception as e:
+            print(f"Error saving port data: {e}")
+
+def _port_bindable(port):
+    """Check that a port is free by trying to bind it on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            # On Windows SO_REUSEADDR would let the bind succeed on a busy port
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            # Ignore sockets lingering in TIME_WAIT
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(('127.0.0.1', port))
+            return True
+        except OSError:
+            return False
+
+def launch_browser(browser_name, profile_name, ports_db=None):
+    """Launch browser with remote debugging enabled for the specified profile.
 
-def launch_browser(browser_name, profile_name):
-    """Launch browser with remote debugging enabled for the specified profile."""
+    Pass a shared PortsDB to batch several launches; the caller is then
+    responsible for calling ports_db.flush() once at the end.
+    """
     browser_name = browser_name.lower()
     
     # Validate browser
@@ -71,50 +153,36 @@ def launch_browser(browser_name, profile_name):
         print(f"Error: Unsupported browser '{browser_name}'. Supported browsers: {', '.join(SUPPORTED_BROWSERS.keys())}")
         return False
 
-    # Get browser path based on OS
-    platform = sys.platform
-    if platform.startswith('win'):
-        platform = 'windows'
-    elif platform.startswith('darwin'):
-        platform = 'darwin'
-    else:
-        platform = 'linux'
-
-    browser_path = SUPPORTED_BROWSERS[browser_name][platform]
+    browser_path = BROWSER_EXE[browser_name]
     
     # Load existing port data
-    port_data = load_port_data()
-    if "browsers" not in port_data:
-        port_data["browsers"] = {}
-
-    # Initialize browser data if not exists
-    browser_key = f"{browser_name}_{profile_name}"
-    if browser_key not in port_data["browsers"]:
-        port_data["browsers"][browser_key] = {"ports": []}
+    owns_db = ports_db is None
+    if owns_db:
+        ports_db = PortsDB()
 
-    # Find next available port
-    debug_port = find_next_available_port(port_data)
-    
-    # Verify port is not in use
-    while is_port_in_use(debug_port):
-        debug_port += 1
+    # Claim a port that nothing on this machine is listening on
+    try:
+        debug_port = ports_db.alloc_port(get_listening_ports())
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return False
 
     try:
         # Prepare command line arguments
-        args = [
+        args = (
             browser_path,
             f"--remote-debugging-port={debug_port}",
             f"--user-data-dir={profile_name}",
-            "--no-first-run",
-            "--no-default-browser-check"
-        ]
+            *LAUNCH_ARGS
+        )
 
-        # Launch browser
-        subprocess.Popen(args)
+        # Launch browser detached from this process
+        subprocess.Popen(args, **DETACH_KWARGS)
         
         # Update port data
-        port_data["browsers"][browser_key]["ports"].append(str(debug_port))
-        save_port_data(port_data)
+        ports_db.record_launch(browser_name, profile_name, debug_port)
+        if owns_db:
+            ports_db.flush()
         
         print(f"Successfully launched {browser_name} with profile '{profile_name}' on debug port {debug_port}")
         return True
@@ -123,6 +191,7 @@ def launch_browser(browser_name, profile_name):
         print(f"Error: Browser executable not found at {browser_path}")
     except Exception as e:
         print(f"Error launching browser: {e}")
+    ports_db.release_port(debug_port)
     return False
 
 def main():
@@ -134,7 +203,9 @@ def main():
     browser_name = sys.argv[1]
     profile_name = sys.argv[2]
     
-    launch_browser(browser_name, profile_name)
+    ports_db = PortsDB()
+    launch_browser(browser_name, profile_name, ports_db)
+    ports_db.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,13 +2,16 @@
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import json
 import os
-from browser_restore import restore_browsers
-from app_restore import restore_apps
+import sys
 import uvicorn
 from typing import Optional
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Restoration_engine.browser_restore import restore_browsers
+from Restoration_engine.app_restore import restore_apps
+from common.state_file import load_state, state_exists
+
 app = FastAPI(
     title="State Restoration API",
     description="API for restoring browser and application states",
@@ -38,7 +41,7 @@ async def restore_state(request: RestoreRequest):
         HTTPException: If there are any errors during the restoration process
     """
     try:
-        if not os.path.exists(request.state_file_path):
+        if not state_exists(request.state_file_path):
             raise HTTPException(
                 status_code=404,
                 detail=f"State file not found: {request.state_file_path}"
@@ -46,8 +49,7 @@ async def restore_state(request: RestoreRequest):
 
         # Read state file
         try:
-            with open(request.state_file_path, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            state = load_state(request.state_file_path)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
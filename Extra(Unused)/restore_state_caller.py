@@ -1,6 +1,63 @@
 import subprocess
+import threading
+import atexit
 import os
 
+_DONE = "__DONE__"
+
+class PSRunner:
+    """
+    A long-lived PowerShell process that runs scripts piped to its stdin,
+    so repeated calls don't pay PowerShell startup each time.
+    """
+    def __init__(self):
+        self.proc = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self.proc = subprocess.Popen(
+            ["powershell", "-NoProfile", "-NoLogo", "-ExecutionPolicy", "Bypass", "-Command", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+
+    def run(self, ps1_path):
+        """Run a script and return (success, output)"""
+        with self._lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            quoted = ps1_path.replace("'", "''")
+            # Report the script's exit code (or 1 if it threw) through a sentinel line
+            self.proc.stdin.write(
+                "$LASTEXITCODE = 0; "
+                f"try {{ & '{quoted}'; Write-Output \"{_DONE} $LASTEXITCODE\" }} "
+                f"catch {{ Write-Output $_; Write-Output '{_DONE} 1' }}\n"
+            )
+            self.proc.stdin.flush()
+
+            output = []
+            for line in self.proc.stdout:
+                if line.startswith(_DONE):
+                    return line.split()[1] == "0", "".join(output)
+                output.append(line)
+            # PowerShell exited before the sentinel
+            self.proc = None
+            return False, "".join(output)
+
+    def close(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+_RUNNER = PSRunner()
+atexit.register(_RUNNER.close)
+
 def restore_state(ps1_path="D:\\Major\\Restoration_engine\\Restore-State.ps1"):
     """
     Calls the Restore-State.ps1 PowerShell script from Python.
@@ -10,23 +67,17 @@ def restore_state(ps1_path="D:\\Major\\Restoration_engine\\Restore-State.ps1"):
         if not os.path.exists(ps1_path):
             raise FileNotFoundError(f"Script not found: {ps1_path}")
 
-        # Run the PowerShell script with ExecutionPolicy Bypass
-        result = subprocess.run(
-            ["powershell", "-ExecutionPolicy", "Bypass", "-File", ps1_path],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        # Run the script in the shared PowerShell process
+        success, output = _RUNNER.run(ps1_path)
 
-        print("✅ Restore-State executed successfully.")
-        if result.stdout:
-            print("Output:\n", result.stdout)
-        if result.stderr:
-            print("Errors:\n", result.stderr)
+        if success:
+            print("✅ Restore-State executed successfully.")
+            if output:
+                print("Output:\n", output)
+        else:
+            print("❌ Error running script:")
+            print(output)
 
-    except subprocess.CalledProcessError as e:
-        print("❌ Error running script:")
-        print(e.stderr)
     except Exception as e:
         print("⚠️ Exception:", str(e))
 
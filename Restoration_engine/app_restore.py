@@ -2,47 +2,73 @@
 
 import os
 import subprocess
-import time
-import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 import win32gui
 import win32con
 import win32process
 
+logger = logging.getLogger(__name__)
+
+# Apps that open every file passed on one command line in a single process;
+# others get one instance per file. Names are lowercased for comparison
+BATCH_FRIENDLY_APPS = frozenset(name.lower() for name in [
+    "WINWORD.EXE", "EXCEL.EXE", "POWERPNT.EXE", "Acrobat.exe", "AcroRd32.exe",
+    "notepad++.exe", "Code.exe", "sublime_text.exe"
+])
+
+# Shared pool for process launches; CreateProcess releases the GIL so launches overlap
+_LAUNCH_POOL = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+
+def _launch(args, name):
+    """Start a process, reporting failures instead of raising"""
+    try:
+        return subprocess.Popen(args)
+    except Exception as e:
+        logger.error("Error launching %s: %s", name, e)
+
 def restore_app_files(exe, items, name, window_info=None):
-    """Restore applications and their associated files"""
+    """Queue launches of an application and its associated files, returning the futures"""
     if not exe or not os.path.exists(exe):
         # Try just the process name if exe missing
         exe = name
-    
-    if not items or len(items) == 0:
+
+    if not items:
         # If no files, just open the app
-        try:
-            subprocess.Popen([exe])
-            return
-        except Exception as e:
-            print(f"Error launching {name}: {str(e)}", file=sys.stderr)
-            return
-
-    # Some apps prefer one process with multiple args (Word/Excel), others prefer separate instances
-    one_shot_apps = ["WINWORD.EXE", "EXCEL.EXE", "POWERPNT.EXE", "Acrobat.exe", "AcroRd32.exe"]
-    process = None
-    try:
-        if name in one_shot_apps:
-            process = subprocess.Popen([exe] + items)
-        else:
-            for item in items:
-                subprocess.Popen([exe, item])
-                time.sleep(0.1)
-
-        # Wait briefly for the window to appear
-        time.sleep(1)
-        
-    except Exception as e:
-        print(f"Error launching {name} with items: {str(e)}", file=sys.stderr)
+        return [_LAUNCH_POOL.submit(_launch, [exe], name)]
+
+    if (name or '').lower() in BATCH_FRIENDLY_APPS:
+        return [_LAUNCH_POOL.submit(_launch, [exe] + items, name)]
+    # One instance per file, launched concurrently
+    return [_LAUNCH_POOL.submit(_launch, [exe, item], name) for item in items]
+
+def _existing_files(paths, listing_cache):
+    """Keep the paths that still exist, listing each parent directory only once
+
+    A listing miss falls back to os.path.exists, which also accepts forms the
+    listing can't match (trailing separators, 8.3 short names, other casings).
+    """
+    existing = []
+    for path in paths:
+        parent, name = os.path.split(os.path.normcase(os.path.abspath(path)))
+        names = listing_cache.get(parent)
+        if names is None:
+            try:
+                with os.scandir(parent) as entries:
+                    names = {os.path.normcase(entry.name) for entry in entries}
+            except OSError:
+                names = set()
+            listing_cache[parent] = names
+        if name in names or os.path.exists(path):
+            existing.append(path)
+    return existing
 
 def restore_apps(state):
     """Main function to restore all apps from state"""
+    futures = []
+    listing_cache = {}
     for app in state.get('apps', []):
         # Filter out non-existing files (moved/deleted)
-        existing_items = [f for f in app.get('items', []) if os.path.exists(f)]
-        restore_app_files(app.get('exe'), existing_items, app.get('name'), app.get('mainWindow'))
\ No newline at end of file
+        existing_items = _existing_files(app.get('items', []), listing_cache)
+        futures += restore_app_files(app.get('exe'), existing_items, app.get('name'), app.get('mainWindow'))
+    wait(futures)
@@ -2,14 +2,18 @@
 
 import os
 import subprocess
-import time
-import sys
-import psutil
-import shutil
-from datetime import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from common.profile_utils import (
+    snapshot_procs,
+    snapshot_ports,
+    is_port_in_use,
+    is_profile_in_use,
+    create_profile_copy,
+)
+from common.browser_defaults import URL_PREFIXES, TITLE_PREFIXES, RESTORE_ARGS
 
-# Directory to store profile copies
-PROFILE_COPIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_copies")
+logger = logging.getLogger(__name__)
 
 # Default browser paths
 EXE_PATHS = {
@@ -18,124 +22,38 @@ EXE_PATHS = {
     "opera": "C:\\Users\\jaypa\\AppData\\Local\\Programs\\Opera\\opera.exe"
 }
 
-def is_port_in_use(port):
-    """Check if a port is already in use."""
-    if not port:
-        return False
-    try:
-        port = int(port)
-        for proc in psutil.process_iter(['connections']):
-            try:
-                for conn in proc.connections():
-                    if conn.laddr.port == port:
-                        return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-    except (ValueError, TypeError):
-        return False
-    return False
+# Shared pool for browser launches so windows start concurrently
+_LAUNCH_POOL = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
 
-def is_profile_in_use(profile_path):
-    """Check if a browser profile is currently in use."""
-    if not profile_path:
-        return False
-        
-    # Create the profile directory if it doesn't exist
-    os.makedirs(profile_path, exist_ok=True)
-    
+def _launch(args, browser):
+    """Start a browser process, reporting failures instead of raising"""
     try:
-        lock_file = os.path.join(profile_path, "Lock")
-        if os.path.exists(lock_file):
-            try:
-                # Try to delete the lock file - if we can, profile isn't truly locked
-                os.remove(lock_file)
-                return False
-            except (PermissionError, OSError):
-                # If we can't delete it, profile is in use
-                return True
-        
-        # Check for running browser processes using this profile
-        for proc in psutil.process_iter(['cmdline']):
-            try:
-                cmdline = proc.cmdline()
-                if any(profile_path.lower() in arg.lower() for arg in cmdline if isinstance(arg, str)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-                continue
+        return subprocess.Popen(args)
     except Exception as e:
-        print(f"Error checking profile usage: {str(e)}")
-        return False
-    
-    return False
+        logger.error("Error launching %s: %s", browser, e)
 
-def create_profile_copy(original_profile):
-    """Create a copy of the browser profile with a new name."""
-    if not original_profile:
-        return None
-    
-    try:
-        # Create timestamp-based profile name
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        profile_name = f"profile_copy_{timestamp}"
-        new_profile_path = os.path.join(PROFILE_COPIES_DIR, profile_name)
-        
-        # Create the copies directory if it doesn't exist
-        os.makedirs(PROFILE_COPIES_DIR, exist_ok=True)
-        
-        # Create the basic profile structure
-        print(f"Creating new profile at {new_profile_path}")
-        os.makedirs(new_profile_path, exist_ok=True)
-        os.makedirs(os.path.join(new_profile_path, "Default"), exist_ok=True)
-        
-        # If original profile exists, try to copy essential files
-        if os.path.exists(original_profile):
-            # List of essential directories to copy
-            essential_dirs = [
-                "Default/Bookmarks",
-                "Default/Preferences",
-                "Default/Favicons",
-                "Default/History",
-                "Default/Login Data",
-                "Default/Web Data"
-            ]
-            
-            for item in essential_dirs:
-                src = os.path.join(original_profile, item)
-                dst = os.path.join(new_profile_path, item)
-                dst_dir = os.path.dirname(dst)
-                
-                if os.path.exists(src):
-                    try:
-                        # Ensure the destination directory exists
-                        os.makedirs(dst_dir, exist_ok=True)
-                        # Try to copy the file
-                        if os.path.isfile(src):
-                            shutil.copy2(src, dst)
-                    except (PermissionError, OSError) as e:
-                        print(f"Warning: Could not copy {item}: {str(e)}")
-                        continue
-        
-        return new_profile_path
-    except Exception as e:
-        print(f"Warning: Error while creating profile copy: {str(e)}")
-        # Even if we hit some errors, return the new profile path if it was created
-        if os.path.exists(new_profile_path):
-            return new_profile_path
-        return None
-
-def restore_browser(browser, windows, exe):
-    """Restore browser windows and their tabs"""
-    print(exe)
+def restore_browser(browser, windows, exe, proc_snapshot=None, used_ports=None, used_profiles=None):
+    """Restore browser windows and their tabs, returning the launch futures"""
+    logger.debug("Restoring %s from %s", browser, exe)
+    futures = []
     if not windows or len(windows) == 0:
-        return
+        return futures
+
+    # Snapshot processes and sockets once instead of per window
+    if proc_snapshot is None:
+        proc_snapshot = snapshot_procs()
+    if used_ports is None:
+        used_ports = snapshot_ports()
+    if used_profiles is None:
+        used_profiles = set()
 
     # Open each window as a separate browser window and pass URLs
     for window in windows:
         urls = []
         for tab in window['tabs']:
             if (tab.get('url') and 
-                any(tab['url'].startswith(prefix) for prefix in ['https://', 'http://', 'file://', 'chrome://', 'edge://']) and
-                not any(tab.get('title', '').startswith(prefix) for prefix in ['https://', 'http://'])):
+                tab['url'].startswith(URL_PREFIXES) and
+                not tab.get('title', '').startswith(TITLE_PREFIXES)):
                 urls.append(tab['url'])
         
         if len(urls) == 0:
@@ -143,53 +61,60 @@ def restore_browser(browser, windows, exe):
         
         # Check if debugging port is in use
         debugging_port = window.get('debuggingPort')
-        if is_port_in_use(debugging_port):
-            print(f"Error: Debugging port {debugging_port} is already in use", file=sys.stderr)
+        if is_port_in_use(debugging_port, used_ports):
+            logger.error("Debugging port %s is already in use", debugging_port)
             continue
             
         # Handle profile path
         original_profile = window.get('profile')
         profile_path = original_profile
         
-        print(f"Checking profile: {original_profile}")
+        logger.debug("Checking profile: %s", original_profile)
         if original_profile:
-            if is_profile_in_use(original_profile):
-                print(f"Profile {original_profile} is in use, creating a copy...")
+            # A profile launched earlier in this restore may not hold its Lock yet
+            profile_key = os.path.normcase(os.path.normpath(original_profile))
+            if profile_key in used_profiles or is_profile_in_use(original_profile, proc_snapshot):
+                logger.info("Profile %s is in use, creating a copy", original_profile)
                 new_profile = create_profile_copy(original_profile)
                 if new_profile:
                     profile_path = new_profile
-                    print(f"Successfully created new profile copy at: {profile_path}")
+                    logger.info("Created profile copy at %s", profile_path)
                 else:
-                    print(f"Error: Could not create profile copy for {original_profile}", file=sys.stderr)
+                    logger.error("Could not create profile copy for %s", original_profile)
                     continue
             else:
-                print(f"Profile {original_profile} is not in use, using it directly")
+                logger.debug("Profile %s is not in use, using it directly", original_profile)
+                used_profiles.add(profile_key)
         
         # Start a new window with multiple tabs
-        try:
-            args = [
-                exe,
-                f"--remote-debugging-port={debugging_port}",
-                f"--user-data-dir={profile_path}",
-                "--args",
-                "--new-window",
-                "--no-first-run",
-                "--no-default-browser-check",
-            ]
-            subprocess.Popen(args + urls)
-            time.sleep(0.3)
-        except Exception as e:
-            print(f"Error launching {browser}: {str(e)}", file=sys.stderr)
+        args = (
+            exe,
+            f"--remote-debugging-port={debugging_port}",
+            f"--user-data-dir={profile_path}",
+            *RESTORE_ARGS,
+            *urls
+        )
+        futures.append(_LAUNCH_POOL.submit(_launch, args, browser))
+        # The snapshot predates this launch, so claim its port for later windows
+        if str(debugging_port).isdigit():
+            used_ports.add(int(debugging_port))
+
+    return futures
 
 def restore_browsers(state):
     """Main function to restore all browsers from state"""
+    futures = []
+    proc_snapshot = snapshot_procs()
+    used_ports = snapshot_ports()
+    used_profiles = set()
     for browser in state.get('browsers', []):
         exe = browser.get('exe')
         if exe in [None, ""]:
             if not browser.get('browser') in EXE_PATHS.keys():
-                print("Can't find the executable path for ", browser.get('browser'))
+                logger.error("Can't find the executable path for %s", browser.get('browser'))
                 continue
             else:
                 exe = EXE_PATHS.get(browser.get('browser'))
         
-        restore_browser(browser.get('browser'), browser.get('windows', []), exe)
\ No newline at end of file
+        futures += restore_browser(browser.get('browser'), browser.get('windows', []), exe, proc_snapshot, used_ports, used_profiles)
+    wait(futures)
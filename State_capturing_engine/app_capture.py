@@ -2,141 +2,208 @@
 app_capture.py - Module for capturing application states
 """
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import psutil
+import pythoncom
+import pywintypes
 import win32com.client
 import win32process
 import win32gui
 
-def get_main_window_info(pid):
-    """Get window information for a process"""
-    def callback(hwnd, window_info):
+_SHOW_STATES = {2: "minimized", 3: "maximized"}
+_GWL_EXSTYLE = -20
+_WS_EX_TOOLWINDOW = 0x00000080
+
+def _window_info(hwnd):
+    """Get title, position, size and state of a window"""
+    # Get window title
+    title = win32gui.GetWindowText(hwnd)
+    
+    # Get window rect (position and size)
+    rect = win32gui.GetWindowRect(hwnd)
+    left, top, right, bottom = rect
+    
+    # Get window state from showCmd (2 = SW_SHOWMINIMIZED, 3 = SW_SHOWMAXIMIZED)
+    state = _SHOW_STATES.get(win32gui.GetWindowPlacement(hwnd)[1], "normal")
+    
+    return {
+        "title": title,
+        "position": {
+            "x": left,
+            "y": top
+        },
+        "size": {
+            "width": right - left,
+            "height": bottom - top
+        },
+        "state": state
+    }
+
+def enumerate_all_windows(pids=None):
+    """
+    Enumerate top-level windows once and map each PID to the info of its
+    first visible non-tool window, optionally only for the given PIDs
+    """
+    windows = {}
+
+    def callback(hwnd, _):
         try:
+            # Cheapest rejections first; title and rect are only read for a match
+            if not win32gui.IsWindowVisible(hwnd):
+                return True
             _, found_pid = win32process.GetWindowThreadProcessId(hwnd)
-            if found_pid == pid and win32gui.IsWindowVisible(hwnd):
-                # Get window title
-                title = win32gui.GetWindowText(hwnd)
-                
-                # Get window rect (position and size)
-                rect = win32gui.GetWindowRect(hwnd)
-                left, top, right, bottom = rect
-                
-                # Get window state
-                style = win32gui.GetWindowLong(hwnd, -16)  # GWL_STYLE
-                state = "minimized" if style & 0x20000000 else "maximized" if style & 0x01000000 else "normal"
-                
-                window_info.append({
-                    "title": title,
-                    "position": {
-                        "x": left,
-                        "y": top
-                    },
-                    "size": {
-                        "width": right - left,
-                        "height": bottom - top
-                    },
-                    "state": state
-                })
+            if found_pid in windows or (pids is not None and found_pid not in pids):
+                return True
+            if win32gui.GetWindowLong(hwnd, _GWL_EXSTYLE) & _WS_EX_TOOLWINDOW:
+                return True
+            windows[found_pid] = _window_info(hwnd)
         except Exception:
             pass
         return True
-    
-    window_info = []
-    win32gui.EnumWindows(lambda hwnd, _: callback(hwnd, window_info), None)
-    return window_info[0] if window_info else None
 
-def get_word_docs():
+    win32gui.EnumWindows(callback, None)
+    return windows
+
+# Per-thread flag so COM is initialized once per thread, not per probe
+_com_state = threading.local()
+
+def _ensure_com():
+    """Join the calling thread to the MTA once so cached COM proxies work from any probe thread"""
+    if getattr(_com_state, 'init', False):
+        return
     try:
-        word = win32com.client.GetActiveObject("Word.Application")
-        return [doc.FullName for doc in word.Documents]
-    except Exception:
-        return []
+        pythoncom.CoInitializeEx(pythoncom.COINIT_MULTITHREADED)
+    except pywintypes.com_error:
+        # Already initialized in another apartment (e.g. the main thread's STA)
+        pass
+    _com_state.init = True
 
-def get_excel_books():
+# Office probes block on the foreign process, so run them side by side
+_PROBE_POOL = ThreadPoolExecutor(max_workers=8, initializer=_ensure_com)
+
+# Active COM application objects, reused across captures while the app stays open
+_COM_CACHE = {}
+
+# gencache does no locking of its own around makepy generation or dicts.dat
+_GENCACHE_LOCK = threading.Lock()
+
+def _early_bound(app):
+    """Rewrap a running app with its makepy typelib wrapper, skipping IDispatch name lookups"""
     try:
-        xl = win32com.client.GetActiveObject("Excel.Application")
-        return [wb.FullName for wb in xl.Workbooks]
+        # Generates the gen_py wrapper on first use and reuses the cached one after;
+        # serialized so concurrent probes can't write gen_py at the same time
+        with _GENCACHE_LOCK:
+            return win32com.client.gencache.EnsureDispatch(app)
     except Exception:
-        return []
+        # No registered typelib, stay late-bound
+        return app
+
+def _com_read(progid, read):
+    """Call read() on the running app's COM object, refreshing a stale cached proxy once"""
+    _ensure_com()
+    for _ in range(2):
+        cached = progid in _COM_CACHE
+        try:
+            app = _COM_CACHE.get(progid)
+            if app is None:
+                app = _COM_CACHE[progid] = _early_bound(win32com.client.GetActiveObject(progid))
+            return read(app)
+        except pywintypes.com_error:
+            _COM_CACHE.pop(progid, None)
+            if not cached:
+                break
+        except Exception:
+            break
+    return []
+
+def get_word_docs():
+    return _com_read("Word.Application", lambda word: [doc.FullName for doc in word.Documents])
+
+def get_excel_books():
+    return _com_read("Excel.Application", lambda xl: [wb.FullName for wb in xl.Workbooks])
 
 def get_powerpoint_pres():
-    try:
-        pp = win32com.client.GetActiveObject("PowerPoint.Application")
-        return [pres.FullName for pres in pp.Presentations]
-    except Exception:
-        return []
-    
+    return _com_read("PowerPoint.Application", lambda pp: [pres.FullName for pres in pp.Presentations])
+
 def get_visio_drawings():
-    try:
-        visio = win32com.client.GetActiveObject("Visio.Application")
-        return [doc.FullName for doc in visio.Documents]
-    except Exception:
-        return []
+    return _com_read("Visio.Application", lambda visio: [doc.FullName for doc in visio.Documents])
 
 def get_publisher_docs():
-    try:
-        pub = win32com.client.GetActiveObject("Publisher.Application")
-        return [doc.FullName for doc in pub.Documents]
-    except Exception:
-        return []
+    return _com_read("Publisher.Application", lambda pub: [doc.FullName for doc in pub.Documents])
 
 def get_project_files():
-    try:
-        proj = win32com.client.GetActiveObject("MSProject.Application")
-        return [proj.FullName for proj in proj.Projects]
-    except Exception:
-        return []
+    return _com_read("MSProject.Application", lambda proj: [p.FullName for p in proj.Projects])
 
 def get_access_dbs():
-    try:
-        access = win32com.client.GetActiveObject("Access.Application")
-        return [access.CurrentProject.FullName] if access.CurrentProject else []
-    except Exception:
-        return []
+    return _com_read(
+        "Access.Application",
+        lambda access: [access.CurrentProject.FullName] if access.CurrentProject else []
+    )
 
 def get_onenote_files():
-    try:
-        onenote = win32com.client.GetActiveObject("OneNote.Application")
-        hierarchy = onenote.GetHierarchy("", 3)  # 3 = hsPages
-        return [page.Path for page in hierarchy.PageNodes]
-    except Exception:
-        return []
+    # 3 = hsPages
+    return _com_read(
+        "OneNote.Application",
+        lambda onenote: [page.Path for page in onenote.GetHierarchy("", 3).PageNodes]
+    )
+
+# Applications whose state is captured, compared case-insensitively
+WHITELIST = frozenset(name.lower() for name in [
+    "WINWORD.EXE","EXCEL.EXE","POWERPNT.EXE","VISIO.EXE", "MSPUB.EXE",
+    "MSACCESS.EXE","WINPROJ.EXE","ONENOTE.EXE","notepad.exe","notepad++.exe",
+    "code.exe","devenv.exe","sublime_text.exe","Acrobat.exe",
+    "AcroRd32.exe","vlc.exe","obs64.exe","photoshop.exe","idea64.exe","pycharm64.exe"
+])
+
+# Office document getters keyed by lowercased process name
+OFFICE_APPS = {
+    "winword.exe": get_word_docs,
+    "excel.exe": get_excel_books,
+    "powerpnt.exe": get_powerpoint_pres,
+    "visio.exe": get_visio_drawings,
+    "mspub.exe": get_publisher_docs,
+    "msaccess.exe": get_access_dbs,
+    "winproj.exe": get_project_files,
+    "onenote.exe": get_onenote_files
+}
 
 def capture_app_states():
     """Capture states of all supported applications"""
-    whitelist = [
-        "WINWORD.EXE","EXCEL.EXE","POWERPNT.EXE","VISIO.EXE", "MSPUB.EXE",
-        "MSACCESS.EXE","WINPROJ.EXE","ONENOTE.EXE","notepad.exe","notepad++.exe",
-        "code.exe","Code.exe","devenv.exe","sublime_text.exe","Acrobat.exe",
-        "AcroRd32.exe","vlc.exe","obs64.exe","photoshop.exe","idea64.exe","pycharm64.exe"
-    ]
-
-    office_apps = {
-        "WINWORD.EXE": get_word_docs,
-        "EXCEL.EXE": get_excel_books,
-        "POWERPNT.EXE": get_powerpoint_pres,
-        "VISIO.EXE": get_visio_drawings,
-        "MSPUB.EXE": get_publisher_docs,
-        "MSACCESS.EXE": get_access_dbs,
-        "WINPROJ.EXE": get_project_files,
-        "ONENOTE.EXE": get_onenote_files
+    # Only names for every process; exe and cmdline just for the matches
+    running = []
+    for proc in psutil.process_iter(['pid', 'name']):
+        if (proc.info['name'] or '').lower() not in WHITELIST:
+            continue
+        try:
+            running.append(proc.as_dict(['pid', 'name', 'exe', 'cmdline']))
+        except psutil.NoSuchProcess:
+            continue
+
+    # Probe each running Office app once, concurrently
+    probes = {
+        key: _PROBE_POOL.submit(OFFICE_APPS[key])
+        for key in {info['name'].lower() for info in running}
+        if key in OFFICE_APPS
     }
+    office_files = {key: future.result() for key, future in probes.items()}
+
+    # One window enumeration for every process that gets an entry
+    all_windows = enumerate_all_windows({
+        info['pid'] for info in running if office_files.get(info['name'].lower())
+    })
 
     apps = []
-    for proc in psutil.process_iter(['pid', 'name', 'exe', 'cmdline']):
-        name = proc.info['name']
-        if name not in whitelist:
-            continue
-        
-        if name in office_apps.keys():
-            files = office_apps[name]()
-            if files:
-                apps.append({
-                    "name": name,
-                    "pid": proc.info['pid'],
-                    "exe": proc.info['exe'],
-                    "cmdline": ' '.join(proc.info['cmdline']) if proc.info['cmdline'] else '',
-                    "files": list(set(files)),
-                    "windowInfo": get_main_window_info(proc.info['pid'])
-                })
-
-    return sorted(apps, key=lambda x: x["name"])
\ No newline at end of file
+    for info in running:
+        files = office_files.get(info['name'].lower())
+        if files:
+            apps.append({
+                "name": info['name'],
+                "pid": info['pid'],
+                "exe": info['exe'],
+                "cmdline": ' '.join(info['cmdline']) if info['cmdline'] else '',
+                "files": list(dict.fromkeys(files)),
+                "windowInfo": all_windows.get(info['pid'])
+            })
+
+    return sorted(apps, key=lambda x: x["name"])
@@ -1,38 +1,39 @@
 """
 browser_capture.py - Module for capturing browser states
 """
-import json
-import requests
+import asyncio
+import httpx
 
-def get_devtools_tabs(base_url):
-    """Get tabs information from browser's devtools API"""
+from common import json_utils
+from common.browser_defaults import DEVTOOLS_TIMEOUT, URL_PREFIXES, TITLE_PREFIXES
+
+def _format_tabs(tabs):
+    """Keep restorable page tabs from a DevTools /json target list"""
+    formatted_tabs = []
+    for tab in tabs:
+        # Reject service workers, iframes etc. before looking at URLs
+        if (tab.get('type') == 'page' and
+            tab.get('url', '').startswith(URL_PREFIXES) and
+            not tab.get('title', '').startswith(TITLE_PREFIXES)):
+            formatted_tabs.append({
+                "url": tab.get("url"),
+                "title": tab.get("title"),
+                "description": tab.get("description", "")
+            })
+    return formatted_tabs
+
+async def get_devtools_tabs_async(base_url, client):
+    """Get tabs information from browser's devtools API without blocking the event loop"""
     try:
-        resp = requests.get(f"{base_url}/json", timeout=10)
-        tabs = resp.json()
-        formatted_tabs = []
-        for tab in tabs:
-            if (tab.get('url') and 
-                any(tab['url'].startswith(prefix) for prefix in ['https://', 'http://', 'file://', 'chrome://', 'edge://']) and
-                not any(tab.get('title', '').startswith(prefix) for prefix in ['https://', 'http://']) and tab.get('type') == 'page'):
-                formatted_tabs.append({
-                    "url": tab.get("url"),
-                    "title": tab.get("title"),
-                    "description": tab.get("description", "")
-                })
-        return formatted_tabs
+        resp = await client.get(f"{base_url}/json")
+        return _format_tabs(json_utils.loads(resp.content))
     except Exception:
         return []
 
-def capture_browser_states(browser_data):
-    """Capture states of all browsers"""
-
-    browsers = []
-    
-    # Process all browser types
+def _active_targets(browser_data):
+    """List every active (browser, profile, port) in browser_data"""
+    targets = []
     for browser_name, browser_info in browser_data.items():
-        browser_windows = []
-        browser_exe = browser_info.get("exe")
-        
         # Process all profiles for this browser
         for profile_info in browser_info.get("profiles", []):
             # Handle both profile name formats
@@ -43,23 +44,43 @@ def capture_browser_states(browser_data):
             # Process all instances of this profile
             for instance in profile_info.get("instances", []):
                 if instance.get("status") == "active":
-                    port = instance["port"]
-                    tabs = get_devtools_tabs(f"http://localhost:{port}")
-                    
-                    if tabs:
-                        window = {
-                            "profile": profile_path,
-                            "debuggingPort": int(port),
-                            "tabs": tabs
-                        }
-                        browser_windows.append(window)
-        
-        # Add browser to list if it has active windows
+                    targets.append((browser_name, profile_path, instance["port"]))
+    return targets
+
+def _assemble_browsers(browser_data, targets, results):
+    """Group per-port tab results into browser entries, in browser_data order"""
+    windows_by_browser = {}
+    for (browser_name, profile_path, port), tabs in zip(targets, results):
+        if tabs:
+            windows_by_browser.setdefault(browser_name, []).append({
+                "profile": profile_path,
+                "debuggingPort": int(port),
+                "tabs": tabs
+            })
+
+    # Add browsers that have active windows
+    browsers = []
+    for browser_name, browser_info in browser_data.items():
+        browser_windows = windows_by_browser.get(browser_name)
         if browser_windows:
             browsers.append({
                 "browser": browser_name,  
-                "exe": browser_exe,
+                "exe": browser_info.get("exe"),
                 "windows": browser_windows
             })
-    
-    return browsers
\ No newline at end of file
+    return browsers
+
+async def capture_browser_states_async(browser_data):
+    """Capture states of all browsers, querying every DevTools port concurrently on the event loop"""
+    targets = _active_targets(browser_data)
+    if not targets:
+        return []
+
+    connect, read = DEVTOOLS_TIMEOUT
+    timeout = httpx.Timeout(read, connect=connect)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        results = await asyncio.gather(*(
+            get_devtools_tabs_async(f"http://localhost:{port}", client)
+            for _, _, port in targets
+        ))
+    return _assemble_browsers(browser_data, targets, results)
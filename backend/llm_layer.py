@@ -22,6 +22,10 @@ if not api_key:
     
 client = instructor.patch(groq.Groq(api_key=api_key))
 
+# Prompt text is invariant; only the provider and log entry change per call
+SYSTEM_PROMPT = "You are a world-class log parsing expert. Your task is to extract structured data from a raw log entry into the provided schema. Do not invent any information that is not present in the log. Categorize the event type accurately based on the provider and content."
+USER_PROMPT_TEMPLATE = "Provider: {}\n\nLog entry: {}\n\nParse this log entry into structured data according to the ActivityLog schema."
+
 def parse_with_llm(provider: str, message: str, max_retries=3, base_delay=5):
     """
     Parses a log message using a constrained LLM call with Groq.
@@ -42,8 +46,9 @@ def parse_with_llm(provider: str, message: str, max_retries=3, base_delay=5):
                 model="llama3-70b-8192",  # Using Llama 3 70B model via Groq
                 response_model=ActivityLog,
                 messages=[
-                    {"role": "system", "content": "You are a world-class log parsing expert. Your task is to extract structured data from a raw log entry into the provided schema. Do not invent any information that is not present in the log. Categorize the event type accurately based on the provider and content."},
-                    {"role": "user", "content": f"Provider: {provider}\n\nLog entry: {message}\n\nParse this log entry into structured data according to the ActivityLog schema."},
+                    # Fresh dicts per call, the client may annotate messages in place
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": USER_PROMPT_TEMPLATE.format(provider, message)},
                 ],
             )
             logger.info(f"LLM parsing successful for provider: '{provider}'")
@@ -4,22 +4,24 @@ Provides endpoints for real-time log processing and topic matching
 """
 import os
 import sys
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
-import json
 from fastapi import FastAPI, Query, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import uvicorn
 from dotenv import load_dotenv
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'State_capturing_engine')))
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Restoration_engine')))
-from browser_capture import capture_browser_states
-from app_capture import capture_app_states
-from browser_restore import restore_browsers
-from app_restore import restore_apps
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from State_capturing_engine.browser_capture import capture_browser_states_async
+from State_capturing_engine.app_capture import capture_app_states
+from Restoration_engine.browser_restore import restore_browsers
+from Restoration_engine.app_restore import restore_apps
+from common import json_utils
+from common.state_file import save_state, load_state, state_exists
 
 # Load environment variables
 load_dotenv()
@@ -37,22 +39,25 @@ from topics import TOPICS
 # Import the process_logs function from main.py
 from main import process_logs
 
-# Import restoration modules
-sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Restoration_engine"))
-from browser_restore import restore_browsers
-from app_restore import restore_apps
-from browser_capture import capture_browser_states
-from app_capture import capture_app_states
+UTC = timezone.utc
 
 # Set up the logger
 logger = logging.getLogger(__name__)
 setup_logging()  # Use environment variable LOG_LEVEL
 
+# Serialize responses with orjson when it is installed
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 # Initialize FastAPI app
 app = FastAPI(
     title="IntelliOS API",
     description="API for IntelliOS Log Processing System",
     version="1.0.0",
+    default_response_class=DefaultResponse,
 )
 
 # Add CORS middleware to allow cross-origin requests
@@ -64,6 +69,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# State files shared by the capture and restore endpoints
+STATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'State'))
+STATE_FILE = os.path.join(STATE_DIR, "state.json")
+BROWSER_PORTS_FILE = os.path.join(STATE_DIR, "browser_ports.json")
+os.makedirs(STATE_DIR, exist_ok=True)
+
 # Initialize vector database manager
 vector_db = VectorDBManager()
 
@@ -120,7 +131,7 @@ def process_logs_background(channel: str, hours: int, limit: int, with_topics: b
     global processing_stats
     
     # Calculate the start time for log fetching
-    fetch_since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    fetch_since = datetime.now(UTC) - timedelta(hours=hours)
     
     # Use the process_logs function from main.py
     parsed_logs = process_logs(channel, fetch_since, limit)
@@ -247,7 +258,7 @@ async def get_real_time_logs(
     This is a synchronous endpoint that processes logs and returns them immediately
     """
     # Calculate the start time for log fetching
-    fetch_since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    fetch_since = datetime.now(UTC) - timedelta(hours=hours)
     
     # Process logs
     parsed_logs = process_logs(channel, fetch_since, limit)
@@ -319,21 +330,21 @@ async def get_vector_db_stats():
 
 # State Restoration endpoints
 @app.post("/api/capture", response_model=CaptureResponse, tags=["State Management"])
-async def capture_state():
+async def capture_state(
+    output_format: str = Query("msgpack", alias="format", description="State file format: msgpack or json")
+):
     """
     Capture current system state and save it to a file
     
     Args:
-        request: CaptureRequest containing paths for state.json and browser_ports.json
+        output_format: "msgpack" (default) or "json" for a human-readable state file
         
     Returns:
         CaptureResponse with status and message
     """
     try:
-        state_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..\\State\\state.json"))
-        browser_ports_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..\\State\\browser_ports.json"))
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(state_file_path), exist_ok=True)
+        state_file_path = STATE_FILE
+        browser_ports_file_path = BROWSER_PORTS_FILE
 
         if not os.path.exists(browser_ports_file_path):
             raise HTTPException(
@@ -344,8 +355,7 @@ async def capture_state():
         # Read browser ports file
         browser_ports_data = {}
         try:
-            with open(browser_ports_file_path, 'r', encoding='utf-8') as f:
-                browser_ports_data = json.load(f)
+            browser_ports_data = json_utils.load_file(browser_ports_file_path)
         except Exception as e:
             logger.error(f"Error reading browser ports file: {e}")
             raise HTTPException(
@@ -355,10 +365,14 @@ async def capture_state():
 
         browsers = []
         apps = []
+        # App capture is synchronous psutil/COM/Win32 work, so run it in a
+        # worker thread alongside the browser capture instead of on the event loop
+        apps_future = asyncio.ensure_future(asyncio.to_thread(capture_app_states))
         #Capture browser states
         try:
-            browsers = capture_browser_states(browser_ports_data)
+            browsers = await capture_browser_states_async(browser_ports_data)
         except Exception as e:
+            apps_future.cancel()
             logger.error(f"Error capturing browser states: {e}")
             raise HTTPException(
                 status_code=500,
@@ -366,7 +380,7 @@ async def capture_state():
             )
         # Capture app states
         try:
-            apps = capture_app_states()
+            apps = await apps_future
         except Exception as e:
             logger.error(f"Error capturing app states: {e}")
             raise HTTPException(
@@ -383,14 +397,13 @@ async def capture_state():
         }
         
         # Save state to file
-        with open(state_file_path, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+        saved_path = save_state(state, state_file_path, output_format)
             
         return CaptureResponse(
             status="success",
             message="State captured successfully",
             saved_at=state["saved_at"],
-            file_path=state_file_path
+            file_path=saved_path
         )
             
     except Exception as e:
@@ -415,9 +428,9 @@ async def restore_state():
         HTTPException: If there are any errors during the restoration process
     """
     try:
-        state_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..\\State\\state.json"))
+        state_file_path = STATE_FILE
 
-        if not os.path.exists(state_file_path):
+        if not state_exists(state_file_path):
             raise HTTPException(
                 status_code=404,
                 detail=f"State file not found: {state_file_path}"
@@ -426,8 +439,7 @@ async def restore_state():
         # Read state file
         state = {}
         try:
-            with open(state_file_path, 'r', encoding='utf-8') as f:
-                state = json.load(f)
+            state = load_state(state_file_path)
         except Exception as e:
             logger.error(f"Error reading state file: {e}")
             raise HTTPException(
@@ -442,7 +454,7 @@ async def restore_state():
 
         # Restore browsers
         try:
-            restore_browsers(state)
+            await asyncio.to_thread(restore_browsers, state)
             restoration_details["browsers_restored"] = True
         except Exception as e:
             logger.error(f"Error restoring browsers: {e}")
@@ -453,7 +465,7 @@ async def restore_state():
 
         # Restore apps
         try:
-            restore_apps(state)
+            await asyncio.to_thread(restore_apps, state)
             restoration_details["apps_restored"] = True
         except Exception as e:
             logger.error(f"Error restoring apps: {e}")
@@ -478,6 +490,12 @@ async def restore_state():
         )
 
 if __name__ == "__main__":
-    # Run the server
+    # Run the server; set RELOAD=1 for the auto-reloading dev server
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("server:app", host="0.0.0.0", port=port, reload=True)
+    if os.environ.get("RELOAD") == "1":
+        uvicorn.run("server:app", host="0.0.0.0", port=port, reload=True)
+    else:
+        # Stats, the embedding model and the chromadb store are per process,
+        # so extra workers are opt-in
+        workers = int(os.environ.get("WORKERS", 1))
+        uvicorn.run("server:app", host="0.0.0.0", port=port, workers=workers)
@@ -1,5 +1,6 @@
 # vector_db.py
 import os
+import heapq
 import logging
 import chromadb
 import time
@@ -292,12 +293,12 @@ class VectorDBManager:
             similarity = self._cosine_similarity(log_embedding, topic_embedding)
             similarities.append((topic, similarity))
         
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # Select the top N by similarity score without sorting every topic
+        top_similarities = heapq.nlargest(n_results, similarities, key=lambda x: x[1])
         
         # Return top N matches
         topic_matches = []
-        for topic, score in similarities[:n_results]:
+        for topic, score in top_similarities:
             topic_matches.append({
                 "topic": topic,
                 "description": TOPICS.get(topic, ""),
@@ -328,12 +329,12 @@ class VectorDBManager:
             similarity = self._cosine_similarity(log_embedding, topic_embedding)
             similarities.append((topic, similarity))
         
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # Select the top N by similarity score without sorting every topic
+        top_similarities = heapq.nlargest(top_n, similarities, key=lambda x: x[1])
         
         # Return top N matches
         topic_matches = []
-        for topic, score in similarities[:top_n]:
+        for topic, score in top_similarities:
             topic_matches.append({
                 "topic": topic,
                 "description": TOPICS.get(topic, ""),
@@ -0,0 +1,25 @@
+"""
+browser_defaults.py - Browser settings shared by the capture and restore scripts
+"""
+import sys
+import subprocess
+
+# (connect, read) seconds; a dead localhost port should fail fast, a busy browser may answer slowly
+DEVTOOLS_TIMEOUT = (1, 10)
+
+# Tab URLs worth saving and restoring, and titles that are just an unloaded URL
+URL_PREFIXES = ('https://', 'http://', 'file://', 'chrome://', 'edge://')
+TITLE_PREFIXES = ('https://', 'http://')
+
+# Flags passed to every browser launch, and to every restored window
+LAUNCH_ARGS = ("--no-first-run", "--no-default-browser-check")
+RESTORE_ARGS = ("--args", "--new-window", *LAUNCH_ARGS)
+
+# Detach launched browsers so they outlive this process and inherit no handles
+if sys.platform.startswith('win'):
+    DETACH_KWARGS = {
+        "close_fds": True,
+        "creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    }
+else:
+    DETACH_KWARGS = {"close_fds": True, "start_new_session": True}
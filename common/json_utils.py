@@ -0,0 +1,37 @@
+"""
+json_utils.py - JSON helpers that use orjson when it is installed
+"""
+import os
+import json
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Files larger than this are memory-mapped instead of read into a buffer
+MMAP_THRESHOLD = 64 * 1024
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj, indent=False):
+    """Serialize obj to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+def load_file(path):
+    """Parse a JSON file, memory-mapping large files when orjson can read the mapping directly"""
+    with open(path, "rb") as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        return loads(f.read())
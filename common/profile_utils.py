@@ -0,0 +1,247 @@
+"""
+profile_utils.py - Shared helpers for checking and copying browser profiles
+"""
+import os
+import sys
+import stat
+import ctypes
+import shutil
+import tempfile
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+
+logger = logging.getLogger(__name__)
+
+if sys.platform.startswith('win'):
+    from ctypes import wintypes
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.CreateFileW.argtypes = [
+        wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+        wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE
+    ]
+    _kernel32.CreateFileW.restype = wintypes.HANDLE
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    fcntl = None
+else:
+    _kernel32 = None
+    import fcntl
+
+_GENERIC_READ = 0x80000000
+_OPEN_EXISTING = 3
+_FILE_ATTRIBUTE_NORMAL = 0x80
+_INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+_ERROR_SHARING_VIOLATION = 32
+
+# Directory to store profile copies
+PROFILE_COPIES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Restoration_engine", "profile_copies")
+
+# Process names (without .exe) that can hold a browser profile open. Only
+# Windows uses them; elsewhere every process is scanned, since browser process
+# names vary by platform and packaging
+BROWSER_PROCESS_NAMES = frozenset({"chrome", "msedge", "opera", "brave", "vivaldi", "chromium"})
+
+def snapshot_procs(names=BROWSER_PROCESS_NAMES if _kernel32 else None):
+    """Take a single snapshot of the lowercased, joined command lines of running browser processes.
+
+    names filters processes by name with or without a .exe suffix; None reads
+    every process's command line.
+    """
+    snapshot = []
+    # With a name filter, cmdline is read just for the matching processes
+    for proc in psutil.process_iter(['name']):
+        if names is not None:
+            name = (proc.info.get('name') or '').lower()
+            if name.endswith('.exe'):
+                name = name[:-4]
+            if name not in names:
+                continue
+        try:
+            cmdline = proc.cmdline() or []
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        snapshot.append(' '.join(arg for arg in cmdline if isinstance(arg, str)).lower())
+    return snapshot
+
+def get_listening_ports():
+    """Local ports in use, from one system-wide socket table query."""
+    try:
+        return frozenset(conn.laddr.port for conn in psutil.net_connections(kind='inet') if conn.laddr)
+    except psutil.AccessDenied:
+        return frozenset()
+
+def snapshot_ports():
+    """Take a mutable snapshot of get_listening_ports() to reuse across several checks."""
+    return set(get_listening_ports())
+
+def is_port_in_use(port, used_ports=None):
+    """Check if a port is already in use, against a snapshot_ports() result or a fresh query."""
+    if not port:
+        return False
+    try:
+        port = int(port)
+    except (ValueError, TypeError):
+        return False
+    if used_ports is None:
+        used_ports = get_listening_ports()
+    return port in used_ports
+
+def _is_lock_held(lock_file):
+    """Probe a lock file without deleting it.
+
+    Returns True if another process holds it, False if it is free and
+    None if the file could not be probed.
+    """
+    if _kernel32:
+        # Exclusive open (share mode 0) fails with a sharing violation while
+        # the browser holds the lock file
+        handle = _kernel32.CreateFileW(
+            lock_file, _GENERIC_READ, 0, None, _OPEN_EXISTING, _FILE_ATTRIBUTE_NORMAL, None
+        )
+        if handle == _INVALID_HANDLE_VALUE:
+            if ctypes.get_last_error() == _ERROR_SHARING_VIOLATION:
+                return True
+            return None
+        _kernel32.CloseHandle(handle)
+        return False
+
+    try:
+        fd = os.open(lock_file, os.O_RDWR)
+    except PermissionError:
+        return True
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return False
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+
+def is_profile_in_use(profile_path, snapshot=None):
+    """Check if a browser profile is currently in use."""
+    if not profile_path:
+        return False
+        
+    # Create the profile directory if it doesn't exist
+    os.makedirs(profile_path, exist_ok=True)
+    
+    try:
+        lock_file = os.path.join(profile_path, "Lock")
+        if os.path.exists(lock_file):
+            # A non-blocking lock attempt answers the question in O(1)
+            lock_held = _is_lock_held(lock_file)
+            if lock_held is not None:
+                return lock_held
+        
+        # Fall back to checking running browser processes using this profile
+        if snapshot is None:
+            snapshot = snapshot_procs()
+        profile_path_lower = profile_path.lower()
+        return any(profile_path_lower in cmdline for cmdline in snapshot)
+    except Exception as e:
+        logger.error("Error checking profile usage: %s", e)
+        return False
+
+# Files under Default/ carried over into a profile copy
+ESSENTIAL_PROFILE_FILES = frozenset({
+    "Bookmarks",
+    "Preferences",
+    "Favicons",
+    "History",
+    "Login Data",
+    "Web Data"
+})
+
+def _copy_essential(src, dst):
+    """Copy one essential profile file if present, returning a warning on failure."""
+    # One lstat answers both "exists" and "regular file", and gives the size
+    try:
+        st = os.lstat(src)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    try:
+        _fast_copy(src, dst, size=st.st_size)
+    except OSError as e:
+        # The owning browser may hold the file locked
+        return f"Could not copy {src}: {str(e)}"
+    return None
+
+# Files at least this large (History, Web Data, ...) are copied without the system cache
+UNBUFFERED_COPY_THRESHOLD = 1024 * 1024
+_COPY_FILE_NO_BUFFERING = 0x00001000
+
+def _fast_copy(src, dst, *, follow_symlinks=True, size=None):
+    """Copy one file, keeping the data copy inside the kernel where possible."""
+    if sys.platform.startswith('win'):
+        kernel32 = ctypes.windll.kernel32
+        if size is None:
+            try:
+                size = os.path.getsize(src)
+            except OSError:
+                size = 0
+        if size >= UNBUFFERED_COPY_THRESHOLD:
+            copied = kernel32.CopyFileExW(src, dst, None, None, None, _COPY_FILE_NO_BUFFERING)
+        else:
+            copied = kernel32.CopyFileW(src, dst, False)
+        if copied:
+            return dst
+    elif hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                chunk = max(os.fstat(fsrc.fileno()).st_size, 1024 * 1024)
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), chunk):
+                    pass
+            return dst
+        except OSError:
+            pass
+    # macOS (fcopyfile) and failed fast paths go through the stdlib
+    return shutil.copyfile(src, dst, follow_symlinks=follow_symlinks)
+
+def create_profile_copy(original_profile):
+    """Create a copy of the browser profile with a new name."""
+    if not original_profile:
+        return None
+    
+    new_profile_path = None
+    try:
+        # Create the copies directory if it doesn't exist
+        os.makedirs(PROFILE_COPIES_DIR, exist_ok=True)
+        
+        # Timestamped for readability; mkdtemp keeps copies made within the
+        # same second apart
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        new_profile_path = tempfile.mkdtemp(prefix=f"profile_copy_{timestamp}_", dir=PROFILE_COPIES_DIR)
+        
+        # Create the basic profile structure
+        logger.info("Creating new profile at %s", new_profile_path)
+        os.makedirs(os.path.join(new_profile_path, "Default"), exist_ok=True)
+        
+        # If original profile exists, copy the essential files concurrently;
+        # each copy is independent and bound by disk latency
+        src_default = os.path.join(original_profile, "Default")
+        if os.path.isdir(src_default):
+            # Build every (src, dst) pair up front; Default/ already exists
+            dst_default = os.path.join(new_profile_path, "Default")
+            plan = [
+                (os.path.join(src_default, name), os.path.join(dst_default, name))
+                for name in ESSENTIAL_PROFILE_FILES
+            ]
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                warnings = pool.map(lambda pair: _copy_essential(*pair), plan)
+                for warning in warnings:
+                    if warning:
+                        logger.warning(warning)
+        
+        return new_profile_path
+    except Exception as e:
+        logger.warning("Error while creating profile copy: %s", e)
+        # Even if we hit some errors, return the new profile path if it was created
+        if new_profile_path and os.path.exists(new_profile_path):
+            return new_profile_path
+        return None
@@ -0,0 +1,71 @@
+"""
+state_file.py - Persist captured state as MessagePack with a JSON fallback
+"""
+import os
+import tempfile
+from common import json_utils
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def msgpack_path(json_path):
+    """Return the MessagePack sibling of a state .json path"""
+    return os.path.splitext(json_path)[0] + ".msgpack"
+
+def state_exists(json_path):
+    """Check whether a state file exists in either format"""
+    return os.path.exists(json_path) or os.path.exists(msgpack_path(json_path))
+
+def write_bytes_atomic(path, data):
+    """
+    Write bytes to a temp file with raw os.write calls, fsync it, then swap it
+    in so a crash never leaves a truncated file behind
+    """
+    # A unique temp file per call, so concurrent writers never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # mkstemp creates the file owner-only; keep the old readable mode
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def save_state(state, json_path, fmt="msgpack"):
+    """
+    Write state in the requested format and return the path written.
+    Falls back to JSON when fmt is "json" or msgpack is not installed.
+    """
+    if fmt == "msgpack" and msgpack is not None:
+        path = msgpack_path(json_path)
+        data = msgpack.packb(state, use_bin_type=True)
+    else:
+        path = json_path
+        data = json_utils.dumps(state, indent=True)
+    write_bytes_atomic(path, data)
+    return path
+
+def load_state(json_path):
+    """Load whichever of the MessagePack and JSON state files was written last"""
+    packed = msgpack_path(json_path)
+    if msgpack is not None and os.path.exists(packed):
+        if not os.path.exists(json_path) or os.path.getmtime(packed) >= os.path.getmtime(json_path):
+            try:
+                with open(packed, "rb") as f:
+                    return msgpack.unpackb(f.read(), raw=False)
+            except ValueError:
+                # Corrupt or truncated MessagePack, fall back to JSON
+                pass
+    return json_utils.load_file(json_path)